@@ -0,0 +1,24 @@
+"""Python API for scripting QueueCTL without going through the CLI"""
+
+import functools
+from typing import Any, Dict, List, Optional
+
+from .models import Job
+from .storage import Storage
+from .job_manager import JobManager
+
+
+@functools.lru_cache(maxsize=None)
+def _job_manager(db_path: Optional[str]) -> JobManager:
+    """One storage connection and job manager per database"""
+    return JobManager(Storage(db_path))
+
+
+def enqueue_batch(specs: List[Dict[str, Any]], db_path: Optional[str] = None) -> List[Job]:
+    """Enqueue many jobs in a single transaction
+
+    Each spec takes the same fields as ``queuectl enqueue``: ``command``
+    is required, ``id`` and ``max_retries`` are optional. ``db_path``
+    defaults to ``$QUEUECTL_DB`` or ``queuectl.db``.
+    """
+    return _job_manager(db_path).enqueue_jobs(specs)
@@ -1,21 +1,43 @@
 """CLI interface for QueueCTL"""
 
 import click
+import functools
 import json
 import sys
-import signal
 import time
 from datetime import datetime
+from typing import TYPE_CHECKING
 from .models import JobState, QueueConfig
 from .storage import Storage
-from .job_manager import JobManager
-from .worker import WorkerManager
 
+if TYPE_CHECKING:
+    from .job_manager import JobManager
+    from .worker import WorkerManager
 
-# Global instances
-storage = Storage()
-job_manager = JobManager(storage)
-worker_manager = WorkerManager(storage, job_manager)
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    json_loads = json.loads
+
+
+# Shared instances, created on first use so commands that don't need
+# them (e.g. --help) skip opening the database and importing workers
+@functools.lru_cache(maxsize=1)
+def _storage() -> Storage:
+    return Storage()
+
+
+@functools.lru_cache(maxsize=1)
+def _job_manager() -> 'JobManager':
+    from .job_manager import JobManager
+    return JobManager(_storage())
+
+
+@functools.lru_cache(maxsize=1)
+def _worker_manager() -> 'WorkerManager':
+    from .worker import WorkerManager
+    return WorkerManager(_storage(), _job_manager())
 
 
 @click.group()
@@ -33,7 +55,7 @@ def enqueue(job_data):
     Example: queuectl enqueue '{"id":"job1","command":"sleep 2"}'
     """
     try:
-        data = json.loads(job_data)
+        data = json_loads(job_data)
         command = data.get('command')
         job_id = data.get('id')
         max_retries = data.get('max_retries')
@@ -42,7 +64,7 @@ def enqueue(job_data):
             click.echo("Error: 'command' field is required", err=True)
             sys.exit(1)
         
-        job = job_manager.enqueue_job(command, job_id, max_retries)
+        job = _job_manager().enqueue_job(command, job_id, max_retries)
         click.echo(f"Enqueued job {job.id}: {job.command}")
         
     except json.JSONDecodeError:
@@ -53,6 +75,42 @@ def enqueue(job_data):
         sys.exit(1)
 
 
+@cli.command('enqueue-batch')
+@click.argument('input_file', type=click.File('r'), default='-')
+def enqueue_batch(input_file):
+    """Add many jobs from newline-delimited JSON in one transaction
+    
+    Reads one job object per line from INPUT_FILE (default: stdin).
+    
+    Example: cat jobs.ndjson | queuectl enqueue-batch
+    """
+    try:
+        specs = []
+        for line_no, line in enumerate(input_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                data = json_loads(line)
+            except json.JSONDecodeError:
+                click.echo(f"Error: Invalid JSON format on line {line_no}", err=True)
+                sys.exit(1)
+            
+            if not data.get('command'):
+                click.echo(f"Error: 'command' field is required (line {line_no})", err=True)
+                sys.exit(1)
+            
+            specs.append(data)
+        
+        jobs = _job_manager().enqueue_jobs(specs)
+        click.echo(f"Enqueued {len(jobs)} jobs")
+        
+    except Exception as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
 @cli.group()
 def worker():
     """Worker management commands"""
@@ -63,25 +121,25 @@ def worker():
 @click.option('--count', '-c', default=1, help='Number of workers to start')
 def start(count):
     """Start one or more workers"""
+    import signal
+    import threading
+    
     try:
+        shutdown = threading.Event()
+        
         def signal_handler(signum, frame):
-            click.echo("\nShutting down workers...")
-            worker_manager.stop_workers()
-            sys.exit(0)
+            shutdown.set()
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
-        started_workers = worker_manager.start_workers(count)
+        started_workers = _worker_manager().start_workers(count)
         click.echo(f"Started {len(started_workers)} workers")
         
-        # Keep main thread alive
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            click.echo("\nShutting down workers...")
-            worker_manager.stop_workers()
+        # Block the main thread until a shutdown signal arrives
+        shutdown.wait()
+        click.echo("\nShutting down workers...")
+        _worker_manager().stop_workers()
             
     except Exception as e:
         click.echo(f"Error starting workers: {e}", err=True)
@@ -91,16 +149,47 @@ def start(count):
 @worker.command()
 def stop():
     """Stop running workers gracefully"""
-    stopped_count = worker_manager.stop_workers()
+    stopped_count = _worker_manager().stop_workers()
     click.echo(f"Stopped {stopped_count} workers")
 
 
+@worker.command('status')
+def worker_status():
+    """Show workers running in any queuectl process"""
+    try:
+        workers = _storage().get_workers()
+
+        click.echo(f"Active Workers: {len(workers)}")
+        for w in workers:
+            click.echo(f"worker-{w.id} (pid {w.pid}): {w.status}, started {w.started_at:%Y-%m-%d %H:%M:%S}")
+
+    except Exception as e:
+        click.echo(f"Error getting worker status: {e}", err=True)
+        sys.exit(1)
+
+
 @cli.command()
-def status():
+@click.option('--watch', is_flag=True, help='Keep printing job counts until interrupted')
+@click.option('--interval', default=1.0, type=click.FloatRange(min=0.1),
+              help='Seconds between refreshes with --watch')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Print status as a JSON object (one per line with --watch)')
+def status(watch, interval, as_json):
     """Show summary of all job states & active workers"""
     try:
-        queue_status = storage.get_queue_status()
-        active_workers = worker_manager.get_active_workers()
+        if watch:
+            _watch_status(interval, as_json)
+            return
+        
+        # Workers are read from the registry, so status never imports the
+        # worker stack
+        queue_status = _storage().get_queue_status()
+        active_workers = _storage().get_workers()
+        
+        if as_json:
+            queue_status.active_workers = len(active_workers)
+            click.echo(json.dumps(queue_status.to_dict()))
+            return
         
         click.echo("=== Queue Status ===")
         click.echo(f"Pending:    {queue_status.pending}")
@@ -108,40 +197,60 @@ def status():
         click.echo(f"Completed:  {queue_status.completed}")
         click.echo(f"Failed:     {queue_status.failed}")
         click.echo(f"Dead:       {queue_status.dead}")
-        click.echo(f"Active Workers: {worker_manager.get_worker_count()}")
+        click.echo(f"Active Workers: {len(active_workers)}")
         
         if active_workers:
             click.echo("\n=== Active Workers ===")
             for worker in active_workers:
-                current_job = f" (processing {worker.current_job_id})" if worker.current_job_id else ""
-                click.echo(f"{worker.id}: {worker.status}{current_job}")
+                click.echo(f"worker-{worker.id} (pid {worker.pid}): {worker.status}")
                 
     except Exception as e:
         click.echo(f"Error getting status: {e}", err=True)
         sys.exit(1)
 
 
+def _watch_status(interval: float, as_json: bool = False):
+    """Print job counts every interval seconds over one open connection
+    
+    With as_json each refresh is one JSON object per line (JSON Lines).
+    """
+    storage = _storage()
+    try:
+        while True:
+            s = storage.get_queue_status()
+            if as_json:
+                s.active_workers = len(storage.get_workers())
+                click.echo(json.dumps(s.to_dict()))
+            else:
+                click.echo(
+                    f"{datetime.now():%H:%M:%S}  pending={s.pending} processing={s.processing} "
+                    f"completed={s.completed} failed={s.failed} dead={s.dead}"
+                )
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
 @cli.command()
 @click.option('--state', help='Filter jobs by state (pending, processing, completed, failed, dead)')
 @click.option('--limit', default=10, help='Maximum number of jobs to show')
-def list(state, limit):
+@click.option('--json', 'as_json', is_flag=True, help='Print jobs as a JSON array')
+def list(state, limit, as_json):
     """List jobs by state"""
     try:
         if state:
             try:
                 job_state = JobState(state)
-                jobs = storage.get_jobs_by_state(job_state)
+                jobs = _storage().get_jobs_by_state(job_state)[:limit]
             except ValueError:
                 click.echo(f"Error: Invalid state '{state}'. Valid states: pending, processing, completed, failed, dead", err=True)
                 sys.exit(1)
         else:
-            # Get all jobs (we'll need to implement this)
-            jobs = []
-            for state_enum in JobState:
-                jobs.extend(storage.get_jobs_by_state(state_enum))
+            jobs = _storage().get_all_jobs(limit)
         
-        # Limit results
-        jobs = jobs[:limit]
+        if as_json:
+            click.echo(json.dumps([job.to_dict() for job in jobs]))
+            return
         
         if not jobs:
             click.echo("No jobs found")
@@ -171,7 +280,7 @@ def dlq():
 def list(limit):
     """View jobs in Dead Letter Queue"""
     try:
-        dead_jobs = storage.get_jobs_by_state(JobState.DEAD)[:limit]
+        dead_jobs = _storage().get_jobs_by_state(JobState.DEAD)[:limit]
         
         if not dead_jobs:
             click.echo("No jobs in Dead Letter Queue")
@@ -195,7 +304,7 @@ def list(limit):
 def retry(job_id):
     """Retry a job from Dead Letter Queue"""
     try:
-        if job_manager.retry_job(job_id):
+        if _job_manager().retry_job(job_id):
             click.echo(f"Job {job_id} moved back to pending queue")
         else:
             click.echo(f"Job {job_id} not found in Dead Letter Queue", err=True)
@@ -206,6 +315,18 @@ def retry(job_id):
         sys.exit(1)
 
 
+@dlq.command('retry-all')
+def retry_all():
+    """Retry every job in Dead Letter Queue"""
+    try:
+        count = _job_manager().retry_all_dead()
+        click.echo(f"Moved {count} jobs back to pending queue")
+            
+    except Exception as e:
+        click.echo(f"Error retrying jobs: {e}", err=True)
+        sys.exit(1)
+
+
 @cli.group()
 def config():
     """Configuration management"""
@@ -218,19 +339,11 @@ def config():
 def set(key, value):
     """Set configuration value"""
     try:
-        current_config = storage.get_config()
-        
-        if key == 'max-retries':
-            current_config.max_retries = value
-        elif key == 'backoff-base':
-            current_config.backoff_base = value
-        elif key == 'worker-poll-interval':
-            current_config.worker_poll_interval = value
-        else:
+        if key not in ('max-retries', 'backoff-base', 'worker-poll-interval'):
             click.echo(f"Error: Unknown config key '{key}'. Valid keys: max-retries, backoff-base, worker-poll-interval", err=True)
             sys.exit(1)
         
-        storage.save_config(current_config)
+        _storage().set_config_key(key.replace('-', '_'), value)
         click.echo(f"Set {key} = {value}")
         
     except Exception as e:
@@ -242,7 +355,7 @@ def set(key, value):
 def show():
     """Show current configuration"""
     try:
-        config = storage.get_config()
+        config = _storage().get_config(refresh=True)
         click.echo("=== Configuration ===")
         click.echo(f"max-retries: {config.max_retries}")
         click.echo(f"backoff-base: {config.backoff_base}")
@@ -1,16 +1,63 @@
 """Job management and execution logic"""
 
-import subprocess
+import asyncio
+import os
+import shlex
+import shutil
+import signal
+import tempfile
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 from .models import Job, JobState, QueueConfig
 from .storage import Storage
 
 
+# Characters that only /bin/sh can interpret (pipes, redirects, globs, ...)
+SHELL_METACHARACTERS = frozenset('|&;<>()$`*?[]{}~#\n')
+
+# Commands /bin/sh runs as builtins even when an executable of the same
+# name is on PATH; their behavior differs (echo escapes, logical pwd, ...),
+# so jobs starting with one keep going through the shell
+SHELL_BUILTINS = frozenset({
+    'alias', 'bg', 'cd', 'command', 'echo', 'fg', 'getopts', 'hash', 'jobs',
+    'kill', 'printf', 'pwd', 'read', 'test', 'times', 'type', 'ulimit',
+    'umask', 'unalias', 'wait',
+})
+
+# Bytes of stdout/stderr kept in job.output/job.error_message; anything
+# earlier is dropped so one chatty job can't bloat every later save of its row
+MAX_OUTPUT = 16 * 1024
+
+
+def _command_argv(command: str) -> Optional[List[str]]:
+    """Split a command for direct exec, or return None if it needs a shell"""
+    if any(ch in SHELL_METACHARACTERS for ch in command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not argv or argv[0] in SHELL_BUILTINS:
+        return None
+    # Other builtins ('exit', 'export') and env assignments have no executable
+    if shutil.which(argv[0]) is None:
+        return None
+    return argv
+
+
+def _read_tail(f, size: int) -> str:
+    """Read at most the last size bytes of a file"""
+    end = f.seek(0, os.SEEK_END)
+    f.seek(max(0, end - size))
+    return f.read().decode(errors='replace')
+
+
 class JobManager:
     def __init__(self, storage: Storage):
         self.storage = storage
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._new_job: Optional[asyncio.Event] = None
 
     def enqueue_job(self, command: str, job_id: Optional[str] = None, max_retries: Optional[int] = None) -> Job:
         """Add a new job to the queue"""
@@ -27,47 +74,126 @@ class JobManager:
         )
         
         self.storage.save_job(job)
+        self.notify_workers()
         return job
 
-    def execute_job(self, job: Job) -> bool:
-        """Execute a job and return success status"""
-        # Update job state to processing
-        job.state = JobState.PROCESSING
-        job.updated_at = datetime.now()
-        self.storage.save_job(job)
+    def enqueue_jobs(self, specs: List[Dict[str, Any]]) -> List[Job]:
+        """Add many jobs to the queue in a single transaction"""
+        config = self.storage.get_config()
+        now = datetime.now()
+        
+        jobs = [
+            Job(
+                id=spec.get('id') or str(uuid.uuid4()),
+                command=spec['command'],
+                state=JobState.PENDING,
+                attempts=0,
+                max_retries=spec.get('max_retries') or config.max_retries,
+                created_at=now,
+                updated_at=now
+            )
+            for spec in specs
+        ]
+        
+        self.storage.save_jobs(jobs)
+        self.notify_workers()
+        return jobs
+
+    async def bind_loop(self):
+        """Deliver new-job wakeups to workers on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._new_job = asyncio.Event()
+
+    def unbind_loop(self):
+        """Stop delivering new-job wakeups"""
+        self._loop = None
+        self._new_job = None
 
+    def notify_workers(self):
+        """Wake idle workers waiting for new jobs (safe from any thread)"""
+        loop, new_job = self._loop, self._new_job
+        if loop is not None:
+            loop.call_soon_threadsafe(new_job.set)
+
+    async def wait_for_job(self, timeout: float):
+        """Wait until a job is enqueued or the timeout expires"""
         try:
-            # Execute the command
-            result = subprocess.run(
-                job.command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
-            
-            job.output = result.stdout
-            job.updated_at = datetime.now()
-            
-            if result.returncode == 0:
+            await asyncio.wait_for(self._new_job.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._new_job.clear()
+
+    async def execute_job(
+        self,
+        job: Job,
+        on_start: Optional[Callable[[asyncio.subprocess.Process], None]] = None
+    ) -> bool:
+        """Execute a claimed job and return success status
+        
+        on_start is called with the job's process once it is spawned.
+        """
+        loop = asyncio.get_running_loop()
+        success = False
+        try:
+            # Execute the command without tying up a thread while it runs;
+            # output goes to disk so chatty jobs don't grow memory
+            argv = _command_argv(job.command)
+            with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+                # Own session/process group, so a timeout can kill the whole
+                # tree rather than just the shell
+                options = dict(
+                    stdout=stdout_file,
+                    stderr=stderr_file,
+                    start_new_session=True
+                )
+                if argv:
+                    proc = await asyncio.create_subprocess_exec(*argv, **options)
+                else:
+                    proc = await asyncio.create_subprocess_shell(job.command, **options)
+                if on_start:
+                    on_start(proc)
+                try:
+                    await asyncio.wait_for(
+                        proc.wait(),
+                        timeout=300  # 5 minute timeout
+                    )
+                except asyncio.TimeoutError:
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    await proc.wait()
+                    raise
+
+                job.output = _read_tail(stdout_file, MAX_OUTPUT)
+                stderr = _read_tail(stderr_file, MAX_OUTPUT)
+
+            if proc.returncode == 0:
                 # Success
                 job.state = JobState.COMPLETED
-                self.storage.save_job(job)
-                return True
+                success = True
             else:
                 # Command failed
-                job.error_message = result.stderr or f"Command exited with code {result.returncode}"
-                return self._handle_job_failure(job)
+                job.error_message = stderr or f"Command exited with code {proc.returncode}"
                 
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             job.error_message = "Job execution timed out"
-            return self._handle_job_failure(job)
         except Exception as e:
             job.error_message = f"Execution error: {str(e)}"
-            return self._handle_job_failure(job)
 
-    def _handle_job_failure(self, job: Job) -> bool:
-        """Handle job failure with retry logic"""
+        await loop.run_in_executor(None, self._finish_job, job, success)
+        return success
+
+    def _finish_job(self, job: Job, success: bool):
+        """Record the outcome of a job attempt with a single write"""
+        if success:
+            job.updated_at = datetime.now()
+        else:
+            self._handle_job_failure(job)
+        self.storage.update_job(job)
+
+    def _handle_job_failure(self, job: Job):
+        """Apply retry logic to a failed job (the caller saves it)"""
         job.attempts += 1
         job.updated_at = datetime.now()
         
@@ -81,9 +207,6 @@ class JobManager:
             delay_seconds = config.backoff_base ** job.attempts
             job.next_retry_at = datetime.now() + timedelta(seconds=delay_seconds)
             job.state = JobState.FAILED
-        
-        self.storage.save_job(job)
-        return False
 
     def retry_job(self, job_id: str) -> bool:
         """Retry a job from DLQ"""
@@ -102,6 +225,13 @@ class JobManager:
         
         return False
 
+    def retry_all_dead(self) -> int:
+        """Retry every job in the DLQ and return how many were moved"""
+        count = self.storage.bulk_retry_dead()
+        if count:
+            self.notify_workers()
+        return count
+
     def get_next_job(self) -> Optional[Job]:
-        """Get the next job to process"""
-        return self.storage.get_next_pending_job()
\ No newline at end of file
+        """Claim the next job to process"""
+        return self.storage.claim_next_pending_job()
\ No newline at end of file
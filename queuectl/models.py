@@ -30,13 +30,18 @@ class Job:
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert job to dictionary for JSON serialization"""
-        data = asdict(self)
-        data['state'] = self.state.value
-        data['created_at'] = self.created_at.isoformat()
-        data['updated_at'] = self.updated_at.isoformat()
-        if self.next_retry_at:
-            data['next_retry_at'] = self.next_retry_at.isoformat()
-        return data
+        return {
+            'id': self.id,
+            'command': self.command,
+            'state': self.state.value,
+            'attempts': self.attempts,
+            'max_retries': self.max_retries,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'next_retry_at': self.next_retry_at.isoformat() if self.next_retry_at else None,
+            'error_message': self.error_message,
+            'output': self.output,
+        }
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Job':
@@ -51,7 +56,7 @@ class Job:
 
 @dataclass
 class WorkerInfo:
-    id: str
+    id: int
     pid: int
     status: str
     current_job_id: Optional[str]
@@ -59,9 +64,13 @@ class WorkerInfo:
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert worker info to dictionary"""
-        data = asdict(self)
-        data['started_at'] = self.started_at.isoformat()
-        return data
+        return {
+            'id': self.id,
+            'pid': self.pid,
+            'status': self.status,
+            'current_job_id': self.current_job_id,
+            'started_at': self.started_at.isoformat(),
+        }
 
 
 @dataclass
@@ -85,4 +94,15 @@ class QueueStatus:
     completed: int
     failed: int
     dead: int
-    active_workers: int
\ No newline at end of file
+    active_workers: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert status to dictionary"""
+        return {
+            'pending': self.pending,
+            'processing': self.processing,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dead': self.dead,
+            'active_workers': self.active_workers,
+        }
\ No newline at end of file
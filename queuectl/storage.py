@@ -3,132 +3,436 @@
 import sqlite3
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from .models import Job, JobState, QueueConfig, QueueStatus
+from .models import Job, JobState, QueueConfig, QueueStatus, WorkerInfo
+
+
+# Database file used when no path is given; QUEUECTL_DB overrides it
+DEFAULT_DB_PATH = "queuectl.db"
+
+# Size of the memory-mapped window SQLite may use for reads (256 MB)
+MMAP_SIZE = 256 * 1024 * 1024
+
+# How long a cached config stays valid; bounds how stale a config change
+# made by another process can look
+CONFIG_CACHE_TTL = 5.0
+
+# Seconds between worker heartbeats, and how long a registered worker may
+# go without one before it stops counting as active (its process is gone,
+# or its pid now belongs to something else)
+WORKER_HEARTBEAT_INTERVAL = 5.0
+WORKER_HEARTBEAT_TTL = 3 * WORKER_HEARTBEAT_INTERVAL
+
+JOBS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        max_retries INTEGER DEFAULT 3,
+        created_at INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL,
+        next_retry_at INTEGER,
+        error_message TEXT,
+        output TEXT
+    )
+"""
+
+SAVE_JOB_SQL = """
+    INSERT OR REPLACE INTO jobs
+    (id, command, state, attempts, max_retries, created_at, updated_at,
+     next_retry_at, error_message, output)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_JOB_SQL = """
+    UPDATE jobs
+    SET state = ?, attempts = ?, updated_at = ?, next_retry_at = ?,
+        error_message = ?, output = ?
+    WHERE id = ?
+"""
+
+GET_JOB_SQL = "SELECT * FROM jobs WHERE id = ?"
+
+JOBS_BY_STATE_SQL = "SELECT * FROM jobs WHERE state = ?"
+
+ALL_JOBS_SQL = "SELECT * FROM jobs ORDER BY state, created_at LIMIT ?"
+
+# Oldest pending job and earliest due retry; each branch is answered by
+# its own (state, ...) index and the older of the two candidates wins
+NEXT_JOB_CANDIDATES_SQL = """
+    SELECT * FROM (
+        SELECT * FROM jobs
+        WHERE state = 'pending'
+        ORDER BY created_at ASC
+        LIMIT 1
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT * FROM jobs
+        WHERE state = 'failed' AND next_retry_at <= ?
+        ORDER BY next_retry_at ASC
+        LIMIT 1
+    )
+"""
+
+CLAIM_NEXT_JOB_SQL = f"""
+    UPDATE jobs
+    SET state = 'processing', updated_at = ?
+    WHERE id = (
+        SELECT id FROM ({NEXT_JOB_CANDIDATES_SQL})
+        ORDER BY created_at ASC
+        LIMIT 1
+    )
+    RETURNING *
+"""
+
+BULK_RETRY_DEAD_SQL = """
+    UPDATE jobs
+    SET state = 'pending', attempts = 0, error_message = NULL,
+        next_retry_at = NULL, updated_at = ?
+    WHERE state = 'dead'
+"""
+
+QUEUE_STATUS_SQL = """
+    SELECT state, COUNT(*) as count
+    FROM jobs
+    GROUP BY state
+"""
+
+CONFIG_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS config (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+"""
+
+SEED_CONFIG_SQL = "INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)"
+
+SET_CONFIG_SQL = """
+    INSERT INTO config (key, value) VALUES (?, ?)
+    ON CONFLICT(key) DO UPDATE SET value = excluded.value
+"""
+
+GET_CONFIG_SQL = "SELECT key, value FROM config"
+
+# Workers register here so any queuectl process (e.g. 'status') can see
+# workers running in another one
+WORKERS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS workers (
+        pid INTEGER NOT NULL,
+        id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        started_at INTEGER NOT NULL,
+        heartbeat_at INTEGER NOT NULL,
+        PRIMARY KEY (pid, id)
+    )
+"""
+
+REGISTER_WORKER_SQL = """
+    INSERT OR REPLACE INTO workers (pid, id, status, started_at, heartbeat_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+UNREGISTER_WORKERS_SQL = "DELETE FROM workers WHERE pid = ?"
+
+HEARTBEAT_WORKERS_SQL = "UPDATE workers SET heartbeat_at = ? WHERE pid = ?"
+
+EXPIRE_WORKERS_SQL = "DELETE FROM workers WHERE heartbeat_at < ?"
+
+GET_WORKERS_SQL = "SELECT * FROM workers WHERE heartbeat_at >= ? ORDER BY pid, id"
+
+
+def _to_epoch_ms(dt: datetime) -> int:
+    """Convert a datetime to integer unix milliseconds for storage"""
+    return int(dt.timestamp() * 1000)
+
+
+def _from_epoch_ms(value: int) -> datetime:
+    """Convert stored integer unix milliseconds back to a datetime"""
+    return datetime.fromtimestamp(value / 1000)
+
+
+def _now_ms() -> int:
+    """Current time as integer unix milliseconds"""
+    return int(time.time() * 1000)
+
+
+def _heartbeat_cutoff_ms() -> int:
+    """Oldest heartbeat a worker can have and still count as active"""
+    return _now_ms() - int(WORKER_HEARTBEAT_TTL * 1000)
 
 
 class Storage:
-    def __init__(self, db_path: str = "queuectl.db"):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get("QUEUECTL_DB", DEFAULT_DB_PATH)
+        self._local = threading.local()
+        self._config_cache: Optional[QueueConfig] = None
+        self._config_cached_at = 0.0
+        self._config_lock = threading.Lock()
         self.init_db()
 
+    def _conn(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed writes in a single IMMEDIATE transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
     def init_db(self):
         """Initialize database tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS jobs (
-                    id TEXT PRIMARY KEY,
-                    command TEXT NOT NULL,
-                    state TEXT NOT NULL,
-                    attempts INTEGER DEFAULT 0,
-                    max_retries INTEGER DEFAULT 3,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    next_retry_at TEXT,
-                    error_message TEXT,
-                    output TEXT
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS config (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL
+        conn = self._conn()
+        conn.execute(JOBS_TABLE_SQL)
+        self._migrate_iso_timestamps()
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_created ON jobs(state, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_next_retry ON jobs(state, next_retry_at)")
+
+        conn.execute(CONFIG_TABLE_SQL)
+        self._migrate_config_blob()
+
+        # The registry only holds running workers, so a table from before
+        # heartbeats is dropped rather than migrated
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(workers)")}
+        if columns and 'heartbeat_at' not in columns:
+            conn.execute("DROP TABLE IF EXISTS workers")
+        conn.execute(WORKERS_TABLE_SQL)
+
+        # Initialize default config rows if not exists
+        defaults = QueueConfig().to_dict()
+        cursor = conn.execute("SELECT COUNT(*) FROM config")
+        if cursor.fetchone()[0] < len(defaults):
+            with self._transaction() as conn:
+                conn.executemany(SEED_CONFIG_SQL, defaults.items())
+
+    def _migrate_iso_timestamps(self):
+        """Convert a jobs table created with ISO-8601 TEXT timestamps to epoch integers"""
+        if not self._has_iso_timestamps():
+            return
+
+        with self._transaction() as conn:
+            # Another process may have migrated while we waited for the lock
+            if not self._has_iso_timestamps():
+                return
+
+            conn.execute("ALTER TABLE jobs RENAME TO jobs_iso")
+            conn.execute(JOBS_TABLE_SQL)
+            rows = conn.execute("SELECT * FROM jobs_iso").fetchall()
+            conn.executemany(SAVE_JOB_SQL, [
+                (
+                    row['id'], row['command'], row['state'], row['attempts'], row['max_retries'],
+                    _to_epoch_ms(datetime.fromisoformat(row['created_at'])),
+                    _to_epoch_ms(datetime.fromisoformat(row['updated_at'])),
+                    _to_epoch_ms(datetime.fromisoformat(row['next_retry_at'])) if row['next_retry_at'] else None,
+                    row['error_message'], row['output']
                 )
-            """)
-            
-            # Initialize default config if not exists
-            cursor = conn.execute("SELECT COUNT(*) FROM config")
-            if cursor.fetchone()[0] == 0:
-                default_config = QueueConfig()
-                self.save_config(default_config)
+                for row in rows
+            ])
+            conn.execute("DROP TABLE jobs_iso")
+
+    def _migrate_config_blob(self):
+        """Rebuild a legacy config table (TEXT values, JSON 'queue_config' row)
+
+        The legacy table is recreated with INTEGER values; the JSON blob is
+        split into one row per key, with any per-key rows taking precedence.
+        """
+        if not self._has_legacy_config():
+            return
+
+        with self._transaction() as conn:
+            # Another process may have migrated while we waited for the lock
+            if not self._has_legacy_config():
+                return
+
+            conn.execute("ALTER TABLE config RENAME TO config_legacy")
+            conn.execute(CONFIG_TABLE_SQL)
+            values = {}
+            rows = conn.execute("SELECT key, value FROM config_legacy").fetchall()
+            for row in rows:
+                if row['key'] == 'queue_config':
+                    values.update(json.loads(row['value']))
+            for row in rows:
+                if row['key'] != 'queue_config':
+                    values[row['key']] = row['value']
+            conn.executemany(SET_CONFIG_SQL, [(key, int(value)) for key, value in values.items()])
+            conn.execute("DROP TABLE config_legacy")
+
+    def _has_legacy_config(self) -> bool:
+        """Check whether the config table still has the TEXT value column"""
+        columns = {row['name']: row['type'] for row in self._conn().execute("PRAGMA table_info(config)")}
+        return columns['value'] == 'TEXT'
+
+    def _has_iso_timestamps(self) -> bool:
+        """Check whether the jobs table still uses TEXT timestamp columns"""
+        columns = {row['name']: row['type'] for row in self._conn().execute("PRAGMA table_info(jobs)")}
+        return columns['created_at'] == 'TEXT'
 
     def save_job(self, job: Job):
         """Save or update a job"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO jobs 
-                (id, command, state, attempts, max_retries, created_at, updated_at, 
-                 next_retry_at, error_message, output)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                job.id, job.command, job.state.value, job.attempts, job.max_retries,
-                job.created_at.isoformat(), job.updated_at.isoformat(),
-                job.next_retry_at.isoformat() if job.next_retry_at else None,
-                job.error_message, job.output
+        with self._transaction() as conn:
+            conn.execute(SAVE_JOB_SQL, self._job_to_row(job))
+
+    def save_jobs(self, jobs: List[Job]):
+        """Save or update many jobs in a single transaction"""
+        with self._transaction() as conn:
+            conn.executemany(SAVE_JOB_SQL, [self._job_to_row(job) for job in jobs])
+
+    def update_job(self, job: Job):
+        """Write back the mutable fields of an existing job in place"""
+        with self._transaction() as conn:
+            conn.execute(UPDATE_JOB_SQL, (
+                job.state.value, job.attempts, _to_epoch_ms(job.updated_at),
+                _to_epoch_ms(job.next_retry_at) if job.next_retry_at else None,
+                job.error_message, job.output, job.id
             ))
 
     def get_job(self, job_id: str) -> Optional[Job]:
         """Get a job by ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
-            row = cursor.fetchone()
-            if row:
-                return self._row_to_job(row)
+        cursor = self._conn().execute(GET_JOB_SQL, (job_id,))
+        row = cursor.fetchone()
+        if row:
+            return self._row_to_job(row)
         return None
 
     def get_jobs_by_state(self, state: JobState) -> List[Job]:
         """Get all jobs with a specific state"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM jobs WHERE state = ?", (state.value,))
-            return [self._row_to_job(row) for row in cursor.fetchall()]
+        cursor = self._conn().execute(JOBS_BY_STATE_SQL, (state.value,))
+        return [self._row_to_job(row) for row in cursor.fetchall()]
 
-    def get_next_pending_job(self) -> Optional[Job]:
-        """Get the next pending job for processing"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("""
-                SELECT * FROM jobs 
-                WHERE state = 'pending' 
-                   OR (state = 'failed' AND next_retry_at <= ?)
-                ORDER BY created_at ASC 
-                LIMIT 1
-            """, (datetime.now().isoformat(),))
-            row = cursor.fetchone()
-            if row:
-                return self._row_to_job(row)
+    def get_all_jobs(self, limit: int) -> List[Job]:
+        """Get up to limit jobs across all states in a single indexed pass"""
+        cursor = self._conn().execute(ALL_JOBS_SQL, (limit,))
+        return [self._row_to_job(row) for row in cursor.fetchall()]
+
+    def claim_next_pending_job(self) -> Optional[Job]:
+        """Atomically mark the next runnable job as processing and return it"""
+        now = _now_ms()
+        with self._transaction() as conn:
+            cursor = conn.execute(CLAIM_NEXT_JOB_SQL, (now, now))
+            rows = cursor.fetchall()
+        if rows:
+            return self._row_to_job(rows[0])
         return None
 
+    def bulk_retry_dead(self) -> int:
+        """Move every dead job back to pending and return how many moved"""
+        with self._transaction() as conn:
+            cursor = conn.execute(BULK_RETRY_DEAD_SQL, (_now_ms(),))
+        return cursor.rowcount
+
     def get_queue_status(self) -> QueueStatus:
         """Get current queue status"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT state, COUNT(*) as count 
-                FROM jobs 
-                GROUP BY state
-            """)
-            counts = {row[0]: row[1] for row in cursor.fetchall()}
-            
-            return QueueStatus(
-                pending=counts.get('pending', 0),
-                processing=counts.get('processing', 0),
-                completed=counts.get('completed', 0),
-                failed=counts.get('failed', 0),
-                dead=counts.get('dead', 0),
-                active_workers=0  # Will be updated by worker manager
-            )
+        cursor = self._conn().execute(QUEUE_STATUS_SQL)
+        counts = {row[0]: row[1] for row in cursor.fetchall()}
+
+        return QueueStatus(
+            pending=counts.get('pending', 0),
+            processing=counts.get('processing', 0),
+            completed=counts.get('completed', 0),
+            failed=counts.get('failed', 0),
+            dead=counts.get('dead', 0),
+            active_workers=0  # Will be updated by worker manager
+        )
 
     def save_config(self, config: QueueConfig):
-        """Save configuration"""
-        with sqlite3.connect(self.db_path) as conn:
-            config_json = json.dumps(config.to_dict())
-            conn.execute("""
-                INSERT OR REPLACE INTO config (key, value) 
-                VALUES ('queue_config', ?)
-            """, (config_json,))
-
-    def get_config(self) -> QueueConfig:
-        """Get configuration"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT value FROM config WHERE key = 'queue_config'")
-            row = cursor.fetchone()
-            if row:
-                config_data = json.loads(row[0])
-                return QueueConfig.from_dict(config_data)
-        return QueueConfig()  # Return default config
+        """Save configuration, writing only the keys whose value changed"""
+        with self._transaction() as conn:
+            current = {row['key']: row['value'] for row in conn.execute(GET_CONFIG_SQL)}
+            changed = [(key, value) for key, value in config.to_dict().items() if current.get(key) != value]
+            conn.executemany(SET_CONFIG_SQL, changed)
+        with self._config_lock:
+            self._config_cache = None
+
+    def set_config_key(self, key: str, value: int):
+        """Set a single configuration value"""
+        if key not in QueueConfig.__dataclass_fields__:
+            raise ValueError(f"Unknown config key '{key}'")
+
+        with self._transaction() as conn:
+            conn.execute(SET_CONFIG_SQL, (key, value))
+        with self._config_lock:
+            self._config_cache = None
+
+    def get_config(self, refresh: bool = False) -> QueueConfig:
+        """Get configuration, served from an in-memory cache when fresh
+
+        refresh=True bypasses the cache, for callers that must see changes
+        made by other processes immediately.
+        """
+        with self._config_lock:
+            if not refresh and self._config_cache is not None and time.monotonic() - self._config_cached_at < CONFIG_CACHE_TTL:
+                return self._config_cache
+
+            cursor = self._conn().execute(GET_CONFIG_SQL)
+            values = {row['key']: int(row['value']) for row in cursor.fetchall()}
+            config = QueueConfig.from_dict(values)
+
+            self._config_cache = config
+            self._config_cached_at = time.monotonic()
+            return config
+
+    def register_workers(self, workers: List[WorkerInfo]):
+        """Record running workers, dropping rows whose heartbeat has expired"""
+        now = _now_ms()
+        with self._transaction() as conn:
+            conn.execute(EXPIRE_WORKERS_SQL, (_heartbeat_cutoff_ms(),))
+            conn.executemany(REGISTER_WORKER_SQL, [
+                (w.pid, w.id, w.status, _to_epoch_ms(w.started_at), now) for w in workers
+            ])
+
+    def heartbeat_workers(self, pid: int):
+        """Mark every worker registered by a process as still alive"""
+        with self._transaction() as conn:
+            conn.execute(HEARTBEAT_WORKERS_SQL, (_now_ms(), pid))
+
+    def unregister_workers(self, pid: int):
+        """Remove every worker registered by a process"""
+        with self._transaction() as conn:
+            conn.execute(UNREGISTER_WORKERS_SQL, (pid,))
+
+    def get_workers(self) -> List[WorkerInfo]:
+        """Get registered workers, skipping those whose heartbeat has expired"""
+        return [
+            WorkerInfo(
+                id=row['id'],
+                pid=row['pid'],
+                status=row['status'],
+                current_job_id=None,
+                started_at=_from_epoch_ms(row['started_at'])
+            )
+            for row in self._conn().execute(GET_WORKERS_SQL, (_heartbeat_cutoff_ms(),))
+        ]
+
+    def _job_to_row(self, job: Job) -> tuple:
+        """Convert Job object to SAVE_JOB_SQL parameters"""
+        return (
+            job.id, job.command, job.state.value, job.attempts, job.max_retries,
+            _to_epoch_ms(job.created_at), _to_epoch_ms(job.updated_at),
+            _to_epoch_ms(job.next_retry_at) if job.next_retry_at else None,
+            job.error_message, job.output
+        )
 
     def _row_to_job(self, row) -> Job:
         """Convert database row to Job object"""
@@ -138,9 +442,9 @@ class Storage:
             state=JobState(row['state']),
             attempts=row['attempts'],
             max_retries=row['max_retries'],
-            created_at=datetime.fromisoformat(row['created_at']),
-            updated_at=datetime.fromisoformat(row['updated_at']),
-            next_retry_at=datetime.fromisoformat(row['next_retry_at']) if row['next_retry_at'] else None,
+            created_at=_from_epoch_ms(row['created_at']),
+            updated_at=_from_epoch_ms(row['updated_at']),
+            next_retry_at=_from_epoch_ms(row['next_retry_at']) if row['next_retry_at'] else None,
             error_message=row['error_message'],
             output=row['output']
-        )
\ No newline at end of file
+        )
@@ -1,133 +1,236 @@
 """Worker process implementation"""
 
+import asyncio
+import concurrent.futures
+import contextlib
 import os
 import signal
-import time
 import threading
 from datetime import datetime
-from typing import Dict, List
+from typing import List, Optional, Tuple
 from .models import WorkerInfo
 from .job_manager import JobManager
-from .storage import Storage
+from .storage import WORKER_HEARTBEAT_INTERVAL, Storage
+
+
+# Seconds a stopping worker gives its job after SIGTERM before SIGKILL
+STOP_GRACE_PERIOD = 5
 
 
 class Worker:
-    def __init__(self, worker_id: str, storage: Storage, job_manager: JobManager):
+    def __init__(self, worker_id: int, storage: Storage, job_manager: JobManager):
         self.worker_id = worker_id
         self.storage = storage
         self.job_manager = job_manager
         self.running = False
         self.current_job_id = None
-        self.thread = None
+        self.current_proc: Optional[asyncio.subprocess.Process] = None
+        self.future: Optional[concurrent.futures.Future] = None
 
-    def start(self):
-        """Start the worker in a separate thread"""
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Schedule the worker on the shared event loop"""
         if self.running:
             return
-        
+
         self.running = True
-        self.thread = threading.Thread(target=self._work_loop, daemon=True)
-        self.thread.start()
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), loop)
 
     def stop(self):
-        """Stop the worker gracefully"""
+        """Stop the worker gracefully, terminating the job it is running"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
+        self.job_manager.notify_workers()
+        if not self.future:
+            return
+
+        # Jobs run in their own session, so Ctrl-C never reaches them;
+        # signal the group so the attempt is recorded before the loop stops
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            self._signal_job(sig)
+            try:
+                self.future.result(timeout=STOP_GRACE_PERIOD)
+                return
+            except concurrent.futures.TimeoutError:
+                pass
+
+    def _signal_job(self, sig: int):
+        """Send a signal to the process group of the running job, if any"""
+        proc = self.current_proc
+        if proc is None or proc.returncode is not None:
+            return
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            pass
 
-    def _work_loop(self):
+    def _track_proc(self, proc: asyncio.subprocess.Process):
+        """Remember the running job's process so stop() can signal it"""
+        self.current_proc = proc
+
+    async def run(self):
         """Main worker loop"""
-        config = self.storage.get_config()
-        
+        loop = asyncio.get_running_loop()
+        config = await loop.run_in_executor(None, self.storage.get_config)
+
         while self.running:
             try:
                 # Get next job
-                job = self.job_manager.get_next_job()
-                
+                job = await loop.run_in_executor(None, self.job_manager.get_next_job)
+
                 if job:
                     self.current_job_id = job.id
                     print(f"Worker {self.worker_id} processing job {job.id}: {job.command}")
-                    
+
                     # Execute job
-                    success = self.job_manager.execute_job(job)
-                    
+                    success = await self.job_manager.execute_job(job, on_start=self._track_proc)
+                    self.current_proc = None
+
                     if success:
                         print(f"Worker {self.worker_id} completed job {job.id}")
                     else:
                         print(f"Worker {self.worker_id} failed job {job.id} (attempt {job.attempts})")
-                    
+
                     self.current_job_id = None
                 else:
-                    # No jobs available, sleep
-                    time.sleep(config.worker_poll_interval)
-                    
+                    # No jobs available, wait for an enqueue or the next poll
+                    await self.job_manager.wait_for_job(config.worker_poll_interval)
+
             except Exception as e:
                 print(f"Worker {self.worker_id} error: {e}")
-                time.sleep(1)
+                await asyncio.sleep(1)
 
 
 class WorkerManager:
     def __init__(self, storage: Storage, job_manager: JobManager):
         self.storage = storage
         self.job_manager = job_manager
-        self.workers: Dict[str, Worker] = {}
-        self.worker_processes: Dict[str, WorkerInfo] = {}
+        self.workers: List[Tuple[Worker, WorkerInfo]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._db_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._heartbeat: Optional[asyncio.Task] = None
 
-    def start_workers(self, count: int) -> List[str]:
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the single event loop thread that runs every worker"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            # Every storage call made by workers runs on one dedicated thread,
+            # so they all share a single SQLite connection and statement cache
+            self._db_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="queuectl-db"
+            )
+            self._loop.set_default_executor(self._db_executor)
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._loop_thread.start()
+            asyncio.run_coroutine_threadsafe(self.job_manager.bind_loop(), self._loop).result()
+        return self._loop
+
+    def _stop_loop(self):
+        """Stop the worker event loop once no workers remain"""
+        if self._loop is None:
+            return
+
+        self.job_manager.unbind_loop()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        self._db_executor.shutdown(wait=False)
+        self._loop = None
+        self._loop_thread = None
+        self._db_executor = None
+
+    def start_workers(self, count: int) -> List[int]:
         """Start multiple workers"""
         started_workers = []
-        
+        started_infos = []
+        loop = self._ensure_loop()
+
         for i in range(count):
-            worker_id = f"worker-{len(self.workers) + 1}"
+            worker_id = len(self.workers) + 1
             worker = Worker(worker_id, self.storage, self.job_manager)
-            
-            worker.start()
-            self.workers[worker_id] = worker
-            
+
+            worker.start(loop)
+
             # Track worker info
             worker_info = WorkerInfo(
                 id=worker_id,
-                pid=os.getpid(),  # In threading model, all workers share same PID
+                pid=os.getpid(),  # All workers share the event loop in this process
                 status="running",
                 current_job_id=None,
                 started_at=datetime.now()
             )
-            self.worker_processes[worker_id] = worker_info
+            self.workers.append((worker, worker_info))
             started_workers.append(worker_id)
-            
+            started_infos.append(worker_info)
+
             print(f"Started worker {worker_id}")
-        
+
+        self.storage.register_workers(started_infos)
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.run_coroutine_threadsafe(self._start_heartbeat(), loop).result()
         return started_workers
 
+    async def _start_heartbeat(self) -> asyncio.Task:
+        """Start refreshing this process's workers in the registry"""
+        return asyncio.create_task(self._send_heartbeats())
+
+    async def _stop_heartbeat(self):
+        """Cancel the heartbeat task and wait for it to finish"""
+        self._heartbeat.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._heartbeat
+
+    async def _send_heartbeats(self):
+        """Keep this process's worker rows fresh in the registry"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            try:
+                await loop.run_in_executor(None, self.storage.heartbeat_workers, os.getpid())
+            except Exception as e:
+                print(f"Worker heartbeat error: {e}")
+
     def stop_workers(self) -> int:
         """Stop all workers gracefully"""
-        stopped_count = 0
-        
-        for worker_id, worker in self.workers.items():
-            print(f"Stopping worker {worker_id}...")
+        # Keep idle workers from claiming new jobs while others wind down
+        for worker, _ in self.workers:
+            worker.running = False
+
+        for worker, worker_info in self.workers:
+            print(f"Stopping worker {worker.worker_id}...")
             worker.stop()
-            
-            if worker_id in self.worker_processes:
-                self.worker_processes[worker_id].status = "stopped"
-            
-            stopped_count += 1
-        
+            worker_info.status = "stopped"
+
+        if self._heartbeat is not None:
+            asyncio.run_coroutine_threadsafe(self._stop_heartbeat(), self._loop).result(timeout=5)
+            self._heartbeat = None
+
+        stopped_count = len(self.workers)
         self.workers.clear()
+        self.storage.unregister_workers(os.getpid())
+        self._stop_loop()
         print(f"Stopped {stopped_count} workers")
         return stopped_count
 
     def get_active_workers(self) -> List[WorkerInfo]:
-        """Get list of active workers"""
-        active_workers = []
+        """Get list of active workers
         
-        for worker_id, worker_info in self.worker_processes.items():
-            if worker_id in self.workers and self.workers[worker_id].running:
+        Workers running in this process report their current job; otherwise
+        the workers registered by other queuectl processes are returned.
+        """
+        if not self.workers:
+            return self.storage.get_workers()
+
+        active_workers = []
+
+        for worker, worker_info in self.workers:
+            if worker.running:
                 # Update current job info
-                worker_info.current_job_id = self.workers[worker_id].current_job_id
+                worker_info.current_job_id = worker.current_job_id
                 active_workers.append(worker_info)
-        
+
         return active_workers
 
     def get_worker_count(self) -> int:
         """Get number of active workers"""
-        return len([w for w in self.workers.values() if w.running])
\ No newline at end of file
+        if not self.workers:
+            return len(self.storage.get_workers())
+        return sum(1 for worker, _ in self.workers if worker.running)
@@ -8,6 +8,9 @@ setup(
     install_requires=[
         "click>=8.0.0",
     ],
+    extras_require={
+        "fast": ["orjson>=3.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "queuectl=queuectl.cli:main",